@@ -403,6 +403,11 @@ def affine_line_renderer(
     maskbytes: Optional[Union[bytes, bytearray]],
     aa_mode: int,
 ) -> None:
+    # These are the same for every pixel, so don't recalculate them in the loop.
+    xscale = 1.0 / inverse.xscale
+    yscale = 1.0 / inverse.yscale
+    callback = inverse.multiply_point
+
     while True:
         imgy = work.get()
         if imgy is None:
@@ -422,9 +427,9 @@ def affine_line_renderer(
                     imgheight,
                     texwidth,
                     texheight,
-                    1.0 / inverse.xscale,
-                    1.0 / inverse.yscale,
-                    lambda point: inverse.multiply_point(point),
+                    xscale,
+                    yscale,
+                    callback,
                     add_color,
                     mult_color,
                     blendfunc,
@@ -491,11 +496,16 @@ def affine_composite(
         imgbytes = bytearray(img.tobytes('raw', 'RGBA'))
         texbytes = texture.tobytes('raw', 'RGBA')
         if mask:
-            alpha = mask.split()[-1]
+            alpha = mask.getchannel('A')
             maskbytes = alpha.tobytes('raw', 'L')
         else:
             maskbytes = None
 
+        # These are the same for every pixel, so don't recalculate them in the loop.
+        xscale = 1.0 / inverse.xscale
+        yscale = 1.0 / inverse.yscale
+        callback = inverse.multiply_point
+
         # We don't have enough CPU cores to bother multiprocessing.
         for imgy in range(miny, maxy):
             for imgx in range(minx, maxx):
@@ -508,9 +518,9 @@ def affine_composite(
                     imgheight,
                     texwidth,
                     texheight,
-                    1.0 / inverse.xscale,
-                    1.0 / inverse.yscale,
-                    lambda point: inverse.multiply_point(point),
+                    xscale,
+                    yscale,
+                    callback,
                     add_color,
                     mult_color,
                     blendfunc,
@@ -520,12 +530,12 @@ def affine_composite(
                     aa_mode,
                 )
 
-        img = Image.frombytes('RGBA', (imgwidth, imgheight), bytes(imgbytes))
+        img = Image.frombuffer('RGBA', (imgwidth, imgheight), imgbytes, 'raw', 'RGBA', 0, 1)
     else:
         imgbytes = img.tobytes('raw', 'RGBA')
         texbytes = texture.tobytes('raw', 'RGBA')
         if mask:
-            alpha = mask.split()[-1]
+            alpha = mask.getchannel('A')
             maskbytes = alpha.tobytes('raw', 'L')
         else:
             maskbytes = None
@@ -594,7 +604,7 @@ def affine_composite(
         if interrupted:
             raise KeyboardInterrupt()
 
-        img = Image.frombytes('RGBA', (imgwidth, imgheight), b''.join(lines))
+        img = Image.frombuffer('RGBA', (imgwidth, imgheight), b''.join(lines), 'raw', 'RGBA', 0, 1)
     return img
 
 
@@ -691,15 +701,6 @@ def perspective_composite(
         # This texture is entirely off of the screen.
         return img
 
-    # Get the data in an easier to manipulate and faster to update fashion.
-    imgbytes = bytearray(img.tobytes('raw', 'RGBA'))
-    texbytes = texture.tobytes('raw', 'RGBA')
-    if mask:
-        alpha = mask.split()[-1]
-        maskbytes = alpha.tobytes('raw', 'L')
-    else:
-        maskbytes = None
-
     def perspective_inverse(imgpoint: Point) -> Optional[Point]:
         # Calculate the texture coordinate with our perspective interpolation.
         texdiv = inverse_matrix.multiply_point(imgpoint)
@@ -714,11 +715,15 @@ def perspective_composite(
         imgbytes = bytearray(img.tobytes('raw', 'RGBA'))
         texbytes = texture.tobytes('raw', 'RGBA')
         if mask:
-            alpha = mask.split()[-1]
+            alpha = mask.getchannel('A')
             maskbytes = alpha.tobytes('raw', 'L')
         else:
             maskbytes = None
 
+        # These are the same for every pixel, so don't recalculate them in the loop.
+        xscale = transform.xscale
+        yscale = transform.yscale
+
         # We don't have enough CPU cores to bother multiprocessing.
         for imgy in range(miny, maxy):
             for imgx in range(minx, maxx):
@@ -731,8 +736,8 @@ def perspective_composite(
                     imgheight,
                     texwidth,
                     texheight,
-                    transform.xscale,
-                    transform.yscale,
+                    xscale,
+                    yscale,
                     perspective_inverse,
                     add_color,
                     mult_color,
@@ -743,12 +748,12 @@ def perspective_composite(
                     aa_mode,
                 )
 
-        img = Image.frombytes('RGBA', (imgwidth, imgheight), bytes(imgbytes))
+        img = Image.frombuffer('RGBA', (imgwidth, imgheight), imgbytes, 'raw', 'RGBA', 0, 1)
     else:
         imgbytes = img.tobytes('raw', 'RGBA')
         texbytes = texture.tobytes('raw', 'RGBA')
         if mask:
-            alpha = mask.split()[-1]
+            alpha = mask.getchannel('A')
             maskbytes = alpha.tobytes('raw', 'L')
         else:
             maskbytes = None
@@ -819,5 +824,5 @@ def perspective_composite(
         if interrupted:
             raise KeyboardInterrupt()
 
-        img = Image.frombytes('RGBA', (imgwidth, imgheight), b''.join(lines))
+        img = Image.frombuffer('RGBA', (imgwidth, imgheight), b''.join(lines), 'raw', 'RGBA', 0, 1)
     return img
@@ -101,7 +101,7 @@ def affine_composite(
 
     # Grab the mask data.
     if mask is not None:
-        alpha = mask.split()[-1]
+        alpha = mask.getchannel('A')
         maskdata = alpha.tobytes('raw', 'L')
     else:
         maskdata = None
@@ -149,7 +149,7 @@ def affine_composite(
     # We blitted in-place, return that. There seems to be a reference bug in Cython
     # when called from compiled mypyc code, so if we don't assign to a local variable
     # first this function appears to return None.
-    img = Image.frombytes('RGBA', (imgwidth, imgheight), imgbytes)
+    img = Image.frombuffer('RGBA', (imgwidth, imgheight), imgbytes, 'raw', 'RGBA', 0, 1)
     return img
 
 
@@ -189,7 +189,7 @@ def perspective_composite(
 
     # Grab the mask data.
     if mask is not None:
-        alpha = mask.split()[-1]
+        alpha = mask.getchannel('A')
         maskdata = alpha.tobytes('raw', 'L')
     else:
         maskdata = None
@@ -237,5 +237,5 @@ def perspective_composite(
     # We blitted in-place, return that. There seems to be a reference bug in Cython
     # when called from compiled mypyc code, so if we don't assign to a local variable
     # first this function appears to return None.
-    img = Image.frombytes('RGBA', (imgwidth, imgheight), imgbytes)
+    img = Image.frombuffer('RGBA', (imgwidth, imgheight), imgbytes, 'raw', 'RGBA', 0, 1)
     return img
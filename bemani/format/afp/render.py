@@ -1,4 +1,6 @@
-from typing import Any, Dict, Generator, List, Set, Tuple, Optional, Union
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Generator, List, Set, Tuple, Optional, Union
+from typing_extensions import Final
 from PIL import Image  # type: ignore
 
 from .blend import affine_composite, perspective_composite
@@ -533,6 +535,11 @@ MissingThis = object()
 
 
 class AFPRenderer(VerboseOutput):
+    # How many bytes of rasterized masks to hold onto. Each one is a full RGBA frame the
+    # size of the whole movie, so this is a budget rather than a count to keep large
+    # renders from holding onto hundreds of megabytes.
+    MASK_CACHE_BYTES: Final[int] = 64 * 1024 * 1024
+
     def __init__(self, shapes: Dict[str, Shape] = {}, textures: Dict[str, Image.Image] = {}, swfs: Dict[str, SWF] = {}, single_threaded: bool = False, enable_aa: bool = False) -> None:
         super().__init__()
 
@@ -550,6 +557,10 @@ class AFPRenderer(VerboseOutput):
         self.__root: Optional[PlacedClip] = None
         self.__camera: Optional[PlacedCamera] = None
 
+        # Recently rasterized masks, since masked objects tend to sit still across many frames.
+        self.__mask_cache: "OrderedDict[Tuple[Any, ...], Image.Image]" = OrderedDict()
+        self.__mask_cache_bytes = 0
+
         # List of imports that we provide stub implementations for.
         self.__stubbed_swfs: Set[str] = {
             'aeplib.aeplib',
@@ -563,8 +574,9 @@ class AFPRenderer(VerboseOutput):
         self.shapes[name] = data
 
     def add_texture(self, name: str, data: Image.Image) -> None:
-        # Register a named texture (already loaded PIL image) with the renderer.
-        self.textures[name] = data.convert("RGBA")
+        # Register a named texture (already loaded PIL image) with the renderer. Textures are
+        # only ever read from, so there is no need to copy images that are already RGBA.
+        self.textures[name] = data if data.mode == "RGBA" else data.convert("RGBA")
 
     def add_swf(self, name: str, data: SWF) -> None:
         # Register a named SWF with the renderer.
@@ -588,7 +600,10 @@ class AFPRenderer(VerboseOutput):
                 # This is the SWF we care about.
                 with self.debugging(verbose):
                     swf.color = background_color or swf.color
-                    yield from self.__render(swf, only_depths, only_frames, movie_transform, background_image)
+                    # Depth filtering is checked for every placed object on every frame, so
+                    # make those membership checks constant time.
+                    depths = frozenset(only_depths) if only_depths is not None else None
+                    yield from self.__render(swf, depths, only_frames, movie_transform, background_image)
                     return
 
         raise Exception(f'{path} not found in registered SWFs!')
@@ -1124,6 +1139,58 @@ class AFPRenderer(VerboseOutput):
                 aa_mode=AAMode.NONE,
             )
 
+        # Rasterizing the mask only depends on where it ends up, so if we've drawn the same
+        # mask in the same spot recently we can skip straight to combining it.
+        key: Tuple[Any, ...] = (
+            mask,
+            parent_mask.size,
+            projection,
+            transform.a11, transform.a12, transform.a13,
+            transform.a21, transform.a22, transform.a23,
+            transform.a31, transform.a32, transform.a33,
+            transform.a41, transform.a42, transform.a43,
+        )
+        if projection == AP2PlaceObjectTag.PROJECTION_PERSPECTIVE:
+            if self.__camera is None:
+                print("WARNING: Element requests perspective projection but no camera exists!")
+            else:
+                center = self.__camera.center
+                key = (*key, center.x, center.y, center.z, self.__camera.focal_length)
+
+        if key in self.__mask_cache:
+            self.__mask_cache.move_to_end(key)
+            calculated_mask = self.__mask_cache[key]
+        else:
+            calculated_mask = self.__rasterize_mask(parent_mask, transform, projection, mask)
+            self.__mask_cache[key] = calculated_mask
+            self.__mask_cache_bytes += calculated_mask.width * calculated_mask.height * 4
+
+            # Evict the least recently used masks until we fit. A mask that is larger than
+            # the whole budget on its own ends up evicting itself and isn't cached at all.
+            while self.__mask_cache_bytes > self.MASK_CACHE_BYTES:
+                _, evicted = self.__mask_cache.popitem(last=False)
+                self.__mask_cache_bytes -= evicted.width * evicted.height * 4
+
+        # Composite it onto the current mask.
+        return affine_composite(
+            parent_mask.copy(),
+            Color(0.0, 0.0, 0.0, 0.0),
+            Color(1.0, 1.0, 1.0, 1.0),
+            Matrix.identity(),
+            None,
+            256,
+            calculated_mask,
+            single_threaded=self.__single_threaded,
+            aa_mode=AAMode.NONE,
+        )
+
+    def __rasterize_mask(
+        self,
+        parent_mask: Image.Image,
+        transform: Matrix,
+        projection: int,
+        mask: Mask,
+    ) -> Image.Image:
         # Draw the mask onto a new image.
         if projection == AP2PlaceObjectTag.PROJECTION_AFFINE:
             calculated_mask = affine_composite(
@@ -1139,7 +1206,7 @@ class AFPRenderer(VerboseOutput):
             )
         elif projection == AP2PlaceObjectTag.PROJECTION_PERSPECTIVE:
             if self.__camera is None:
-                print("WARNING: Element requests perspective projection but no camera exists!")
+                # The caller already warned about the missing camera, so just draw it flat.
                 calculated_mask = affine_composite(
                     Image.new('RGBA', (parent_mask.width, parent_mask.height), (0, 0, 0, 0)),
                     Color(0.0, 0.0, 0.0, 0.0),
@@ -1166,18 +1233,7 @@ class AFPRenderer(VerboseOutput):
                     aa_mode=AAMode.NONE,
                 )
 
-        # Composite it onto the current mask.
-        return affine_composite(
-            parent_mask.copy(),
-            Color(0.0, 0.0, 0.0, 0.0),
-            Color(1.0, 1.0, 1.0, 1.0),
-            Matrix.identity(),
-            None,
-            256,
-            calculated_mask,
-            single_threaded=self.__single_threaded,
-            aa_mode=AAMode.NONE,
-        )
+        return calculated_mask
 
     def __render_object(
         self,
@@ -1189,7 +1245,7 @@ class AFPRenderer(VerboseOutput):
         parent_mult_color: Color,
         parent_add_color: Color,
         parent_blend: int,
-        only_depths: Optional[List[int]] = None,
+        only_depths: Optional[FrozenSet[int]] = None,
         prefix: str="",
     ) -> Image.Image:
         if not renderable.visible:
@@ -1198,8 +1254,14 @@ class AFPRenderer(VerboseOutput):
 
         self.vprint(f"{prefix}  Rendering placed object ID {renderable.object_id} from sprite {renderable.source.tag_id} onto Depth {renderable.depth}", component="render")
 
-        # Compute the affine transformation matrix for this object.
-        transform = renderable.transform.multiply(parent_transform).translate(Point.identity().subtract(renderable.rotation_origin))
+        # Compute the affine transformation matrix for this object. Almost nothing sets a
+        # rotation origin, and translating by the zero point leaves the matrix unchanged.
+        # The movie's own scaling comes in as the root clip's parent transform, so it's
+        # already folded into this multiply instead of being applied on top of it.
+        transform = renderable.transform.multiply(parent_transform)
+        origin = renderable.rotation_origin
+        if origin.x != 0.0 or origin.y != 0.0 or origin.z != 0.0:
+            transform = transform.translate(Point.identity().subtract(origin))
         projection = AP2PlaceObjectTag.PROJECTION_PERSPECTIVE if parent_projection == AP2PlaceObjectTag.PROJECTION_PERSPECTIVE else renderable.projection
 
         # Calculate blending and blend color if it is present.
@@ -1216,7 +1278,7 @@ class AFPRenderer(VerboseOutput):
 
         # Render individual shapes if this is a sprite.
         if isinstance(renderable, PlacedClip):
-            new_only_depths: Optional[List[int]] = None
+            new_only_depths: Optional[FrozenSet[int]] = None
             if only_depths is not None:
                 if renderable.depth not in only_depths:
                     if renderable.depth != -1:
@@ -1225,13 +1287,10 @@ class AFPRenderer(VerboseOutput):
                     new_only_depths = only_depths
 
             # This is a sprite placement reference. Make sure that we render lower depths
-            # first, but preserved placed order as well.
-            depths = set(obj.depth for obj in renderable.placed_objects)
-            for depth in sorted(depths):
-                for obj in renderable.placed_objects:
-                    if obj.depth != depth:
-                        continue
-                    img = self.__render_object(img, obj, transform, projection, mask, mult_color, add_color, blend, only_depths=new_only_depths, prefix=prefix + " ")
+            # first, but preserved placed order as well. Python's sort is stable, so one
+            # sort by depth does both without rescanning the display list for every depth.
+            for obj in sorted(renderable.placed_objects, key=lambda obj: obj.depth):
+                img = self.__render_object(img, obj, transform, projection, mask, mult_color, add_color, blend, only_depths=new_only_depths, prefix=prefix + " ")
         elif isinstance(renderable, PlacedShape):
             if only_depths is not None and renderable.depth not in only_depths:
                 # Not on the correct depth plane.
@@ -1606,7 +1665,7 @@ class AFPRenderer(VerboseOutput):
     def __render(
         self,
         swf: SWF,
-        only_depths: Optional[List[int]],
+        only_depths: Optional[FrozenSet[int]],
         only_frames: Optional[List[int]],
         movie_transform: Matrix,
         background_image: Optional[List[Image.Image]],
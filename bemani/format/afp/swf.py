@@ -504,6 +504,9 @@ class SWF(VerboseOutput, TrackedCoverage):
         # Whether this is parsed or not.
         self.parsed = False
 
+        # Whether any tag or frame in this SWF carries bytecode, lazily computed.
+        self.__has_bytecode: Optional[bool] = None
+
     def print_coverage(self, *args: Any, **kwargs: Any) -> None:
         # First print uncovered bytes
         super().print_coverage(*args, **kwargs)
@@ -531,6 +534,31 @@ class SWF(VerboseOutput, TrackedCoverage):
             'labels': self.labels,
         }
 
+    @property
+    def has_bytecode(self) -> bool:
+        # Whether there is anything to decompile in this SWF, including nested sprites.
+        # Parsed SWFs never change, so we only need to walk the tags once.
+        if not self.parsed:
+            raise Exception("Cannot check for bytecode on an unparsed SWF!")
+        if self.__has_bytecode is None:
+            self.__has_bytecode = self.__frames_have_bytecode(self.frames) or self.__tags_have_bytecode(self.tags)
+        return self.__has_bytecode
+
+    def __frames_have_bytecode(self, frames: List[Frame]) -> bool:
+        return any(tag.init_bytecode is not None for frame in frames for tag in frame.imported_tags)
+
+    def __tags_have_bytecode(self, tags: List[Tag]) -> bool:
+        for tag in tags:
+            if isinstance(tag, AP2DoActionTag):
+                return True
+            elif isinstance(tag, AP2PlaceObjectTag):
+                if any(triggers for triggers in tag.triggers.values()):
+                    return True
+            elif isinstance(tag, AP2DefineSpriteTag):
+                if self.__frames_have_bytecode(tag.frames) or self.__tags_have_bytecode(tag.tags):
+                    return True
+        return False
+
     def __parse_bytecode(self, bytecode_name: Optional[str], datachunk: bytes, string_offsets: List[int] = [], prefix: str = "") -> ByteCode:
         # First, we need to check if this is a SWF-style bytecode or an AP2 bytecode.
         ap2_sentinel = struct.unpack("<B", datachunk[0:1])[0]
@@ -51,7 +51,10 @@ class Color:
 
 class Point:
     # A simple 3D point. For ease of construction, the Z can be left out
-    # at which point it is assumed to be zero.
+    # at which point it is assumed to be zero. Points are created for every
+    # pixel that gets blended, so they use slots to skip the per-instance dict.
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, x: float, y: float, z: float = 0.0) -> None:
         self.x = x
         self.y = y
@@ -137,6 +140,20 @@ class Matrix:
     # | c  d  0 |
     # | tx ty 1 |
 
+    # Matrixes are created for every object placed on every frame, so store the
+    # components in slots instead of a per-instance dict.
+    __slots__ = (
+        '__a11', '__a12', '__a13',
+        '__a21', '__a22', '__a23',
+        '__a31', '__a32', '__a33',
+        '__a41', '__a42', '__a43',
+        '__scale_set',
+        '__rotate_set',
+        '__translate_xy_set',
+        '__translate_z_set',
+        '__3d_grid_set',
+    )
+
     def __init__(
         self, *,
         a11: float, a12: float, a13: float,
@@ -453,10 +470,13 @@ class Matrix:
         self.__a43 = val
 
     def multiply_point(self, point: Point) -> Point:
+        # This and multiply() are called for every placed object on every rendered frame,
+        # so pull everything into locals once instead of looking attributes up repeatedly.
+        x, y, z = point.x, point.y, point.z
         return Point(
-            x=(self.__a11 * point.x) + (self.__a21 * point.y) + (self.__a31 * point.z) + self.__a41,
-            y=(self.__a12 * point.x) + (self.__a22 * point.y) + (self.__a32 * point.z) + self.__a42,
-            z=(self.__a13 * point.x) + (self.__a23 * point.y) + (self.__a33 * point.z) + self.__a43,
+            x=(self.__a11 * x) + (self.__a21 * y) + (self.__a31 * z) + self.__a41,
+            y=(self.__a12 * x) + (self.__a22 * y) + (self.__a32 * z) + self.__a42,
+            z=(self.__a13 * x) + (self.__a23 * y) + (self.__a33 * z) + self.__a43,
         )
 
     def translate(self, point: Point) -> "Matrix":
@@ -477,22 +497,31 @@ class Matrix:
         )
 
     def multiply(self, other: "Matrix") -> "Matrix":
+        a11, a12, a13 = self.__a11, self.__a12, self.__a13
+        a21, a22, a23 = self.__a21, self.__a22, self.__a23
+        a31, a32, a33 = self.__a31, self.__a32, self.__a33
+        a41, a42, a43 = self.__a41, self.__a42, self.__a43
+
+        b11, b12, b13 = other.__a11, other.__a12, other.__a13
+        b21, b22, b23 = other.__a21, other.__a22, other.__a23
+        b31, b32, b33 = other.__a31, other.__a32, other.__a33
+
         return Matrix(
-            a11=self.__a11 * other.__a11 + self.__a12 * other.__a21 + self.__a13 * other.__a31,
-            a12=self.__a11 * other.__a12 + self.__a12 * other.__a22 + self.__a13 * other.__a32,
-            a13=self.__a11 * other.__a13 + self.__a12 * other.__a23 + self.__a13 * other.__a33,
+            a11=a11 * b11 + a12 * b21 + a13 * b31,
+            a12=a11 * b12 + a12 * b22 + a13 * b32,
+            a13=a11 * b13 + a12 * b23 + a13 * b33,
 
-            a21=self.__a21 * other.__a11 + self.__a22 * other.__a21 + self.__a23 * other.__a31,
-            a22=self.__a21 * other.__a12 + self.__a22 * other.__a22 + self.__a23 * other.__a32,
-            a23=self.__a21 * other.__a13 + self.__a22 * other.__a23 + self.__a23 * other.__a33,
+            a21=a21 * b11 + a22 * b21 + a23 * b31,
+            a22=a21 * b12 + a22 * b22 + a23 * b32,
+            a23=a21 * b13 + a22 * b23 + a23 * b33,
 
-            a31=self.__a31 * other.__a11 + self.__a32 * other.__a21 + self.__a33 * other.__a31,
-            a32=self.__a31 * other.__a12 + self.__a32 * other.__a22 + self.__a33 * other.__a32,
-            a33=self.__a31 * other.__a13 + self.__a32 * other.__a23 + self.__a33 * other.__a33,
+            a31=a31 * b11 + a32 * b21 + a33 * b31,
+            a32=a31 * b12 + a32 * b22 + a33 * b32,
+            a33=a31 * b13 + a32 * b23 + a33 * b33,
 
-            a41=self.__a41 * other.__a11 + self.__a42 * other.__a21 + self.__a43 * other.__a31 + other.__a41,
-            a42=self.__a41 * other.__a12 + self.__a42 * other.__a22 + self.__a43 * other.__a32 + other.__a42,
-            a43=self.__a41 * other.__a13 + self.__a42 * other.__a23 + self.__a43 * other.__a33 + other.__a43,
+            a41=a41 * b11 + a42 * b21 + a43 * b31 + other.__a41,
+            a42=a41 * b12 + a42 * b22 + a43 * b32 + other.__a42,
+            a43=a41 * b13 + a42 * b23 + a43 * b33 + other.__a43,
         )
 
     def inverse(self) -> "Matrix":
@@ -0,0 +1,133 @@
+# vim: set fileencoding=utf-8
+import contextlib
+import io
+import unittest
+from typing import Any, Callable, List
+from unittest import mock
+
+from PIL import Image  # type: ignore
+
+from bemani.format.afp import AFPRenderer, AP2PlaceObjectTag, Matrix, Point, Rectangle
+from bemani.format.afp.render import Mask, PlacedCamera
+
+
+class TestAFPRenderer(unittest.TestCase):
+
+    def __renderer(self) -> AFPRenderer:
+        return AFPRenderer(single_threaded=True)
+
+    def __apply_mask(self, renderer: AFPRenderer, transform: Matrix, projection: int, mask: Mask, size: int = 32) -> Any:
+        apply_mask: Callable[..., Any] = getattr(renderer, "_AFPRenderer__apply_mask")
+        return apply_mask(Image.new('RGBA', (size, size), (255, 255, 255, 255)), transform, projection, mask)
+
+    def __count_rasterizations(self, renderer: AFPRenderer) -> List[int]:
+        # Wrap the rasterizer on this instance so we can tell cache hits from misses.
+        calls: List[int] = []
+        rasterize: Callable[..., Any] = getattr(renderer, "_AFPRenderer__rasterize_mask")
+
+        def counting_rasterize(*args: Any) -> Any:
+            calls.append(1)
+            return rasterize(*args)
+
+        setattr(renderer, "_AFPRenderer__rasterize_mask", counting_rasterize)
+        return calls
+
+    def __mask_cache(self, renderer: AFPRenderer) -> Any:
+        return getattr(renderer, "_AFPRenderer__mask_cache")
+
+    def test_mask_cache_affine(self) -> None:
+        mask = Mask(Rectangle(left=0.0, top=0.0, bottom=8.0, right=8.0))
+        first = Matrix.affine(a=1.5, b=0.25, c=-0.25, d=1.5, tx=4.0, ty=6.0)
+        second = Matrix.affine(a=1.5, b=0.25, c=-0.25, d=1.5, tx=12.0, ty=6.0)
+
+        renderer = self.__renderer()
+        calls = self.__count_rasterizations(renderer)
+        cached_first = self.__apply_mask(renderer, first, AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+        cached_second = self.__apply_mask(renderer, second, AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+        cached_again = self.__apply_mask(renderer, first, AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+        self.assertEqual(len(calls), 2)
+
+        # A different position must not be served from the cache.
+        self.assertNotEqual(cached_first.tobytes(), cached_second.tobytes())
+
+        # A cache hit must match rasterizing from scratch.
+        fresh_first = self.__apply_mask(self.__renderer(), first, AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+        fresh_second = self.__apply_mask(self.__renderer(), second, AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+        self.assertEqual(cached_first.tobytes(), fresh_first.tobytes())
+        self.assertEqual(cached_again.tobytes(), fresh_first.tobytes())
+        self.assertEqual(cached_second.tobytes(), fresh_second.tobytes())
+
+    def test_mask_cache_perspective(self) -> None:
+        mask = Mask(Rectangle(left=0.0, top=0.0, bottom=8.0, right=8.0))
+        transform = Matrix.affine(a=1.5, b=0.25, c=-0.25, d=1.5, tx=4.0, ty=6.0)
+        transform.a13 = 0.001
+
+        def camera_renderer(center: Point) -> AFPRenderer:
+            renderer = self.__renderer()
+            setattr(renderer, "_AFPRenderer__camera", PlacedCamera(center, 100.0))
+            return renderer
+
+        # Moving the camera must not be served from the cache.
+        renderer = camera_renderer(Point(16.0, 16.0, -100.0))
+        calls = self.__count_rasterizations(renderer)
+        cached_near = self.__apply_mask(renderer, transform, AP2PlaceObjectTag.PROJECTION_PERSPECTIVE, mask)
+        getattr(renderer, "_AFPRenderer__camera").center = Point(8.0, 8.0, -100.0)
+        cached_moved = self.__apply_mask(renderer, transform, AP2PlaceObjectTag.PROJECTION_PERSPECTIVE, mask)
+        self.assertEqual(len(calls), 2)
+
+        fresh_near = self.__apply_mask(camera_renderer(Point(16.0, 16.0, -100.0)), transform, AP2PlaceObjectTag.PROJECTION_PERSPECTIVE, mask)
+        fresh_moved = self.__apply_mask(camera_renderer(Point(8.0, 8.0, -100.0)), transform, AP2PlaceObjectTag.PROJECTION_PERSPECTIVE, mask)
+        self.assertEqual(cached_near.tobytes(), fresh_near.tobytes())
+        self.assertEqual(cached_moved.tobytes(), fresh_moved.tobytes())
+
+        # The same mask drawn flat is a different entry entirely.
+        flat = self.__apply_mask(renderer, transform, AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(
+            flat.tobytes(),
+            self.__apply_mask(self.__renderer(), transform, AP2PlaceObjectTag.PROJECTION_AFFINE, mask).tobytes(),
+        )
+
+    def test_mask_cache_budget(self) -> None:
+        mask = Mask(Rectangle(left=0.0, top=0.0, bottom=8.0, right=8.0))
+
+        def at(x: int) -> Matrix:
+            return Matrix.affine(a=1.0, b=0.0, c=0.0, d=1.0, tx=float(x), ty=0.0)
+
+        # Leave room for exactly four 32x32 RGBA masks.
+        with mock.patch.object(AFPRenderer, "MASK_CACHE_BYTES", 4 * 32 * 32 * 4):
+            renderer = self.__renderer()
+            calls = self.__count_rasterizations(renderer)
+
+            for i in range(8):
+                self.__apply_mask(renderer, at(i), AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+                self.assertLessEqual(len(self.__mask_cache(renderer)), 4)
+            self.assertEqual(len(self.__mask_cache(renderer)), 4)
+
+            # The oldest entries were evicted, the most recent ones are still cached.
+            count = len(calls)
+            self.__apply_mask(renderer, at(7), AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+            self.assertEqual(len(calls), count)
+            self.__apply_mask(renderer, at(0), AP2PlaceObjectTag.PROJECTION_AFFINE, mask)
+            self.assertEqual(len(calls), count + 1)
+
+            # Larger masks take up more of the budget.
+            self.__apply_mask(renderer, at(0), AP2PlaceObjectTag.PROJECTION_AFFINE, mask, size=64)
+            self.assertEqual(len(self.__mask_cache(renderer)), 1)
+
+            # A mask bigger than the whole budget isn't cached at all.
+            self.__apply_mask(renderer, at(0), AP2PlaceObjectTag.PROJECTION_AFFINE, mask, size=72)
+            self.assertEqual(len(self.__mask_cache(renderer)), 0)
+            self.assertEqual(getattr(renderer, "_AFPRenderer__mask_cache_bytes"), 0)
+
+    def test_mask_missing_camera_warning(self) -> None:
+        mask = Mask(Rectangle(left=0.0, top=0.0, bottom=8.0, right=8.0))
+        transform = Matrix.affine(a=1.0, b=0.0, c=0.0, d=1.0, tx=4.0, ty=4.0)
+        renderer = self.__renderer()
+
+        # The warning is printed every time, not just when the mask isn't cached.
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.__apply_mask(renderer, transform, AP2PlaceObjectTag.PROJECTION_PERSPECTIVE, mask)
+            self.__apply_mask(renderer, transform, AP2PlaceObjectTag.PROJECTION_PERSPECTIVE, mask)
+        self.assertEqual(out.getvalue().count("no camera exists"), 2)
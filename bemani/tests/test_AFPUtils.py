@@ -1,7 +1,27 @@
 # vim: set fileencoding=utf-8
+import concurrent.futures
+import contextlib
+import io
+import json
+import os
+import tempfile
 import unittest
+import zipfile
+from types import SimpleNamespace
+from typing import Any, Iterator, List, cast
 
-from bemani.utils.afputils import parse_intlist, adjust_background_loop
+from PIL import Image  # type: ignore
+
+from bemani.format.afp import TXP2File, TextureRegion
+from bemani.utils.afputils import (
+    ExtractOutput,
+    adjust_background_loop,
+    encode_frames,
+    parse_intlist,
+    print_json,
+    region_mapping,
+    write_frame,
+)
 
 
 class TestAFPUtils(unittest.TestCase):
@@ -148,3 +168,173 @@ class TestAFPUtils(unittest.TestCase):
             ),
             [5],
         )
+
+    def test_encode_frames(self) -> None:
+        pulled: List[int] = []
+
+        def frames(count: int, fail_after: int = -1) -> Iterator[Any]:
+            for i in range(count):
+                if i == fail_after:
+                    raise ValueError("render failed")
+                pulled.append(i)
+                yield i
+
+        # Frames reach the encoder in order.
+        encoded: List[Any] = []
+        encode_frames(frames(20), lambda images: encoded.extend(images), 2)
+        self.assertEqual(encoded, list(range(20)))
+
+        # A failure while rendering is re-raised, and the encoder is aborted instead
+        # of finishing with a partial set of frames.
+        aborts: List[BaseException] = []
+
+        def aborted_encode(images: Iterator[Any]) -> None:
+            try:
+                for _ in images:
+                    pass
+            except Exception as e:
+                aborts.append(e)
+                raise
+
+        with self.assertRaises(ValueError):
+            encode_frames(frames(20, fail_after=5), aborted_encode, 2)
+        self.assertEqual(len(aborts), 1)
+
+        # A failure while encoding is re-raised, and rendering stops.
+        pulled.clear()
+
+        def failing_encode(images: Iterator[Any]) -> None:
+            next(images)
+            raise ValueError("encode failed")
+
+        with self.assertRaises(ValueError):
+            encode_frames(frames(1000), failing_encode, 2)
+        self.assertLess(len(pulled), 10)
+
+        # An encoder that stops early stops rendering as well.
+        pulled.clear()
+        encoded.clear()
+
+        def short_encode(images: Iterator[Any]) -> None:
+            encoded.append(next(images))
+
+        encode_frames(frames(1000), short_encode, 2)
+        self.assertEqual(encoded, [0])
+        self.assertLess(len(pulled), 10)
+
+    def test_extract_output_directory(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outdir = os.path.join(tmpdir, "nested", "out")
+            with ExtractOutput(outdir) as output:
+                self.assertEqual(output.directory, outdir)
+                output.write(os.path.join(output.directory, "data.bin"), b"\x00\x01\x02")
+                output.write_text(os.path.join(output.directory, "info.xml"), "<info/>")
+
+            with open(os.path.join(outdir, "data.bin"), "rb") as bfp:
+                self.assertEqual(bfp.read(), b"\x00\x01\x02")
+            with open(os.path.join(outdir, "info.xml"), "r") as sfp:
+                self.assertEqual(sfp.read(), "<info/>")
+
+    @unittest.skipUnless(os.name == "posix", "File permissions are only meaningful on POSIX")
+    def test_extract_output_permissions(self) -> None:
+        # Extracted files get the same permissions a plain open() would give them.
+        old_umask = os.umask(0o002)
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                with ExtractOutput(tmpdir) as output:
+                    output.write(os.path.join(output.directory, "data.bin"), b"data")
+                    output.write_text(os.path.join(output.directory, "info.xml"), "<info/>")
+
+                for name in ["data.bin", "info.xml"]:
+                    self.assertEqual(os.stat(os.path.join(tmpdir, name)).st_mode & 0o777, 0o664)
+        finally:
+            os.umask(old_umask)
+
+    def test_extract_output_archive(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive = os.path.join(tmpdir, "nested", "out.zip")
+            expected = {f"sprite_{i}.png": bytes([i]) * (i + 1) for i in range(32)}
+
+            with ExtractOutput(archive, archive=True) as output:
+                # Files are named relative to the root of the archive.
+                self.assertEqual(output.directory, "")
+                output.write_text(os.path.join(output.directory, "info.xml"), "<info/>")
+
+                # Sprites are written into the archive from several threads at once.
+                with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                    list(executor.map(lambda item: output.write(*item), expected.items()))
+
+            expected["info.xml"] = b"<info/>"
+            with zipfile.ZipFile(archive, "r") as zfp:
+                self.assertEqual(sorted(zfp.namelist()), sorted(expected))
+                for info in zfp.infolist():
+                    self.assertEqual(info.compress_type, zipfile.ZIP_STORED)
+                    self.assertEqual(zfp.read(info), expected[info.filename])
+
+    def test_extract_output_pretend(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive = os.path.join(tmpdir, "out.zip")
+            cwd = os.getcwd()
+            os.chdir(tmpdir)
+            try:
+                with ExtractOutput(archive, archive=True, pretend=True) as output:
+                    # Writing while pretending is a bug, and must not fall through to
+                    # writing files relative to the current directory.
+                    with self.assertRaises(Exception):
+                        output.write(os.path.join(output.directory, "anim.code"), b"code")
+                    with self.assertRaises(Exception):
+                        output.write_text(os.path.join(output.directory, "info.xml"), "<info/>")
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    def test_region_mapping(self) -> None:
+        regions = [
+            TextureRegion(1, 0, 0, 10, 10),
+            TextureRegion(0, 10, 10, 20, 20),
+        ]
+        afpfile = cast(TXP2File, SimpleNamespace(
+            regionmap=SimpleNamespace(entries=["spr_one", "spr_two"]),
+            texture_to_region=regions,
+            texturemap=SimpleNamespace(entries=["tex_a", "tex_b"]),
+        ))
+        self.assertEqual(
+            region_mapping(afpfile),
+            [
+                ("spr_one", regions[0], "tex_b"),
+                ("spr_two", regions[1], "tex_a"),
+            ],
+        )
+
+        # More names than regions is an error.
+        afpfile.regionmap.entries.append("spr_three")
+        with self.assertRaises(Exception):
+            region_mapping(afpfile)
+
+    def test_print_json(self) -> None:
+        data = {"b": [1, 2, {"c": None}], "a": "text", "d": {"z": 1.5, "y": True}}
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            print_json(data)
+        self.assertEqual(out.getvalue(), json.dumps(data, sort_keys=True, indent=4) + "\n")
+
+    def test_write_frame_raw(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "frame.raw")
+
+            # Raw frames are exactly the RGBA framebuffer, with no header.
+            img = Image.new('RGBA', (5, 3), (10, 20, 30, 40))
+            img.putpixel((4, 2), (50, 60, 70, 80))
+            write_frame(img, filename, "RAW")
+            with open(filename, "rb") as bfp:
+                data = bfp.read()
+            self.assertEqual(len(data), 5 * 3 * 4)
+            self.assertEqual(data, img.tobytes("raw", "RGBA"))
+
+            # Frames in other modes are converted to RGBA first.
+            img = Image.new('RGB', (4, 2), (10, 20, 30))
+            write_frame(img, filename, "RAW")
+            with open(filename, "rb") as bfp:
+                data = bfp.read()
+            self.assertEqual(len(data), 4 * 2 * 4)
+            self.assertEqual(data, bytes([10, 20, 30, 255]) * (4 * 2))
@@ -1,22 +1,72 @@
 #! /usr/bin/env python3
 import argparse
+import concurrent.futures
 import io
+import itertools
 import json
-import math
+import mmap
 import os
 import os.path
+import queue
+import shutil
+import subprocess
 import sys
-import textwrap
+import threading
+import zipfile
+from collections import deque
+from contextlib import contextmanager
 from PIL import Image, ImageDraw  # type: ignore
-from typing import Any, Dict, List, Optional, Tuple, TypeVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, TypeVar, cast
 
-from bemani.format.afp import TXP2File, Shape, SWF, Frame, Tag, AP2DoActionTag, AP2PlaceObjectTag, AP2DefineSpriteTag, AFPRenderer, Color, Matrix
+from bemani.format.afp import TXP2File, Texture, TextureRegion, Shape, SWF, Frame, Tag, AP2DoActionTag, AP2PlaceObjectTag, AP2DefineSpriteTag, AFPRenderer, Color, Matrix
 from bemani.format import IFS
 
 
-def write_bytecode(swf: SWF, directory: str, *, verbose: bool) -> None:
-    # Actually place the files down.
-    os.makedirs(directory, exist_ok=True)
+# Templates for the texture and region info XML written out during extraction.
+TEXTURE_INFO_XML = (
+    "<info>\n"
+    "    <width>{width}</width>\n"
+    "    <height>{height}</height>\n"
+    "    <type>{type}</type>\n"
+    "    <raw>{raw}</raw>\n"
+    "</info>"
+)
+REGION_INFO_XML = (
+    "<info>\n"
+    "    <left>{left}</left>\n"
+    "    <top>{top}</top>\n"
+    "    <right>{right}</right>\n"
+    "    <bottom>{bottom}</bottom>\n"
+    "    <texture>{texture}</texture>\n"
+    "</info>"
+)
+
+
+# Signatures of the containers we know how to load, in both endiannesses for TXP2.
+TXP2_MAGIC = (b"2PXT", b"TXP2")
+IFS_MAGIC = b"\x6C\xAD\x8F\x89"
+
+
+# Containers and rendered animations are routinely several megabytes, so read and
+# write them in large chunks rather than the default 8 KiB.
+FILE_BUFFER_SIZE = 1 << 20
+
+
+FRAME_LUT_HEADER = (
+    "// Defined frame labels from animation container, as used for frame lookups.\n"
+    "FRAME_LUT = {\n"
+)
+
+
+def write_decompiled_bytecode(swf: SWF, output: "ExtractOutput", *, pretend: bool=False, verbose: bool) -> None:
+    # Don't bother walking the tags or writing an empty file if there's nothing to decompile.
+    if not swf.has_bytecode:
+        return
+
+    filename = os.path.join(output.directory, swf.exported_name) + ".code"
+    if pretend:
+        print(f"Would write code to {filename}...")
+        return
 
     # Buffer for where the decompiled data goes.
     buff: List[str] = []
@@ -47,21 +97,30 @@ def write_bytecode(swf: SWF, directory: str, *, verbose: bool) -> None:
 
     # If we have frame labels, put them at the top as global defines.
     if lut:
-        buff = [
-            os.linesep.join([
-                '// Defined frame labels from animation container, as used for frame lookups.',
-                'FRAME_LUT = {',
-                *[f"    {name!r}: {frame}," for name, frame in lut.items()],
-                '};',
-            ]),
-            *buff,
-        ]
+        buff.insert(0, FRAME_LUT_HEADER + "".join(f"    {name!r}: {frame},\n" for name, frame in lut.items()) + "};")
 
     # Now, write it out.
-    filename = os.path.join(directory, swf.exported_name) + ".code"
     print(f"Writing code to {filename}...")
-    with open(filename, "wb") as bfp:
-        bfp.write(f"{os.linesep}{os.linesep}".join(buff).encode('utf-8'))
+    output.write(filename, "\n\n".join(buff).encode('utf-8'))
+
+
+@contextmanager
+def mapped_file(fname: str) -> Iterator[bytes]:
+    # Map a container into memory read-only instead of reading the whole thing into
+    # a bytes object. Slicing a mmap hands back bytes, so the container parsers can
+    # consume it as-is, but it is only valid until the context exits. Only use this
+    # with parsers that copy out everything they need up front.
+    with open(fname, "rb") as bfp:
+        with mmap.mmap(bfp.fileno(), 0, access=mmap.ACCESS_READ) as mfp:
+            yield cast(bytes, mfp)
+
+
+def print_json(data: Dict[str, Any]) -> None:
+    # Stream the encoded JSON out as it is generated instead of building the entire
+    # (potentially huge) indented string in memory before printing anything.
+    for chunk in json.JSONEncoder(sort_keys=True, indent=4).iterencode(data):
+        sys.stdout.write(chunk)
+    sys.stdout.write("\n")
 
 
 def parse_intlist(data: str) -> List[int]:
@@ -80,6 +139,108 @@ def parse_intlist(data: str) -> List[int]:
     return sorted(set(ints))
 
 
+class ExtractOutput:
+    # Destination for everything written out of a container. Normally this is a directory
+    # that files are written into, but it can instead be a single uncompressed zip archive,
+    # which avoids creating thousands of tiny files on slow or networked filesystems.
+    def __init__(self, output: str, *, archive: bool = False, pretend: bool = False) -> None:
+        self.__archive: Optional[zipfile.ZipFile] = None
+        self.__pretend = pretend
+
+        # Sprites are written from several threads, and a zip archive can only have one
+        # entry open for writing at a time.
+        self.__lock = threading.Lock()
+
+        if archive:
+            # Files are named relative to the root of the archive.
+            self.directory = ""
+            if not pretend:
+                try:
+                    dirof = os.path.dirname(os.path.abspath(output))
+                    os.makedirs(dirof, exist_ok=True)
+                except FileNotFoundError:
+                    # Apparently on OSX this is possible?
+                    pass
+                self.__archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+        else:
+            self.directory = output
+            os.makedirs(output, exist_ok=True)
+
+    def __enter__(self) -> "ExtractOutput":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.__archive is not None:
+            self.__archive.close()
+            self.__archive = None
+
+    def write(self, filename: str, data: bytes) -> None:
+        if self.__pretend:
+            # Nothing should be written when pretending, and in archive mode the names are
+            # relative, so falling through would scribble into the current directory.
+            raise Exception(f"Cannot write {filename} when pretending!")
+        if self.__archive is not None:
+            with self.__lock:
+                self.__archive.writestr(filename, data)
+            return
+
+        # Hand the finished file to the OS in as few writes as possible, since extracting
+        # can mean writing out hundreds of tiny files.
+        fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o666)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+
+    def write_text(self, filename: str, text: str) -> None:
+        if self.__pretend:
+            raise Exception(f"Cannot write {filename} when pretending!")
+        if self.__archive is not None:
+            with self.__lock:
+                self.__archive.writestr(filename, text)
+            return
+
+        with open(filename, "w") as sfp:
+            sfp.write(text)
+
+
+def encode_png(img: Image.Image, *, fast: bool = False) -> bytes:
+    # Encode the whole PNG in memory so it can be handed off in one go. Sprites and
+    # overlays are intermediate files, so callers can favor speed over compression.
+    bio = io.BytesIO()
+    if fast:
+        img.save(bio, format='PNG', compress_level=1)
+    else:
+        img.save(bio, format='PNG')
+    return bio.getvalue()
+
+
+def write_sprite(output: ExtractOutput, texture: Image.Image, region: TextureRegion, filename: str) -> None:
+    sprite = texture.crop(
+        (region.left // 2, region.top // 2, region.right // 2, region.bottom // 2),
+    )
+    output.write(filename, encode_png(sprite, fast=True))
+
+
+def region_mapping(afpfile: TXP2File) -> List[Tuple[str, TextureRegion, str]]:
+    # Resolve every named region to its texture region and texture name once, so
+    # that callers can walk the region table without repeating the lookups.
+    names = afpfile.regionmap.entries
+    if len(names) > len(afpfile.texture_to_region):
+        raise Exception(f"Out of bounds region {len(afpfile.texture_to_region)}")
+
+    texturenames = afpfile.texturemap.entries
+    return [
+        (name, region, texturenames[region.textureno])
+        for name, region in zip(names, afpfile.texture_to_region)
+    ]
+
+
 def extract_txp2(
     fname: str,
     output_dir: str,
@@ -89,6 +250,9 @@ def extract_txp2(
     write_mappings: bool=False,
     write_raw: bool=False,
     write_binaries: bool=False,
+    write_bytecode: bool=False,
+    disable_threads: bool=False,
+    archive: bool=False,
     pretend: bool=False,
     verbose: bool=False,
 ) -> int:
@@ -98,233 +262,226 @@ def extract_txp2(
         if generate_mapping_overlays:
             raise Exception("Cannot generate mapping overlays when splitting sprites!")
 
-    with open(fname, "rb") as bfp:
-        afpfile = TXP2File(bfp.read(), verbose=verbose)
+    with mapped_file(fname) as data:
+        afpfile = TXP2File(data, verbose=verbose)
+
+    # Look up textures by name once instead of scanning the texture list per region.
+    textures_by_name: Dict[str, Texture] = {tex.name: tex for tex in afpfile.textures}
 
     # Actually place the files down.
-    os.makedirs(output_dir, exist_ok=True)
+    with ExtractOutput(output_dir, archive=archive, pretend=pretend) as output:
+        if not split_textures:
+            for texture in afpfile.textures:
+                filename = os.path.join(output.directory, texture.name)
 
-    if not split_textures:
-        for texture in afpfile.textures:
-            filename = os.path.join(output_dir, texture.name)
+                if texture.img:
+                    if pretend:
+                        print(f"Would write {filename}.png texture...")
+                    else:
+                        print(f"Writing {filename}.png texture...")
+                        output.write(f"{filename}.png", encode_png(texture.img))
 
-            if texture.img:
-                if pretend:
-                    print(f"Would write {filename}.png texture...")
-                else:
-                    print(f"Writing {filename}.png texture...")
-                    with open(f"{filename}.png", "wb") as bfp:
-                        texture.img.save(bfp, format='PNG')
+                if not texture.img or write_raw:
+                    if pretend:
+                        print(f"Would write {filename}.raw texture...")
+                    else:
+                        print(f"Writing {filename}.raw texture...")
+                        output.write(f"{filename}.raw", texture.raw)
 
-            if not texture.img or write_raw:
-                if pretend:
-                    print(f"Would write {filename}.raw texture...")
-                else:
-                    print(f"Writing {filename}.raw texture...")
-                    with open(f"{filename}.raw", "wb") as bfp:
-                        bfp.write(texture.raw)
+                    if pretend:
+                        print(f"Would write {filename}.xml texture info...")
+                    else:
+                        print(f"Writing {filename}.xml texture info...")
+                        output.write_text(f"{filename}.xml", TEXTURE_INFO_XML.format(
+                            width=texture.width,
+                            height=texture.height,
+                            type=hex(texture.fmt),
+                            raw=f"{filename}.raw",
+                        ))
+
+        if write_mappings:
+            if not split_textures:
+                for name, region, texturename in region_mapping(afpfile):
+                    filename = os.path.join(output.directory, name)
+
+                    if pretend:
+                        print(f"Would write {filename}.xml region information...")
+                    else:
+                        print(f"Writing {filename}.xml region information...")
+                        output.write_text(f"{filename}.xml", REGION_INFO_XML.format(
+                            left=region.left,
+                            top=region.top,
+                            right=region.right,
+                            bottom=region.bottom,
+                            texture=texturename,
+                        ))
+
+            if afpfile.fontdata is not None:
+                filename = os.path.join(output.directory, "fontinfo.xml")
 
                 if pretend:
-                    print(f"Would write {filename}.xml texture info...")
+                    print(f"Would write {filename} font information...")
                 else:
-                    print(f"Writing {filename}.xml texture info...")
-                    with open(f"{filename}.xml", "w") as sfp:
-                        sfp.write(textwrap.dedent(f"""
-                            <info>
-                                <width>{texture.width}</width>
-                                <height>{texture.height}</height>
-                                <type>{hex(texture.fmt)}</type>
-                                <raw>{filename}.raw</raw>
-                            </info>
-                        """).strip())
-
-    if write_mappings:
-        if not split_textures:
-            for i, name in enumerate(afpfile.regionmap.entries):
-                if i < 0 or i >= len(afpfile.texture_to_region):
-                    raise Exception(f"Out of bounds region {i}")
-                region = afpfile.texture_to_region[i]
-                texturename = afpfile.texturemap.entries[region.textureno]
-                filename = os.path.join(output_dir, name)
+                    print(f"Writing {filename} font information...")
+                    output.write_text(filename, str(afpfile.fontdata))
+
+        if write_binaries:
+            for i, name in enumerate(afpfile.swfmap.entries):
+                swf = afpfile.swfdata[i]
+                filename = os.path.join(output.directory, name)
 
                 if pretend:
-                    print(f"Would write {filename}.xml region information...")
+                    print(f"Would write {filename}.afp animation data...")
+                    print(f"Would write {filename}.bsi animation descramble data...")
                 else:
-                    print(f"Writing {filename}.xml region information...")
-                    with open(f"{filename}.xml", "w") as sfp:
-                        sfp.write(textwrap.dedent(f"""
-                            <info>
-                                <left>{region.left}</left>
-                                <top>{region.top}</top>
-                                <right>{region.right}</right>
-                                <bottom>{region.bottom}</bottom>
-                                <texture>{texturename}</texture>
-                            </info>
-                        """).strip())
-
-        if afpfile.fontdata is not None:
-            filename = os.path.join(output_dir, "fontinfo.xml")
-
-            if pretend:
-                print(f"Would write {filename} font information...")
-            else:
-                print(f"Writing {filename} font information...")
-                with open(filename, "w") as sfp:
-                    sfp.write(str(afpfile.fontdata))
-
-    if write_binaries:
-        for i, name in enumerate(afpfile.swfmap.entries):
-            swf = afpfile.swfdata[i]
-            filename = os.path.join(output_dir, name)
-
-            if pretend:
-                print(f"Would write {filename}.afp animation data...")
-                print(f"Would write {filename}.bsi animation descramble data...")
-            else:
-                print(f"Writing {filename}.afp animation data...")
-                with open(f"{filename}.afp", "wb") as bfp:
-                    bfp.write(swf.data)
-                print(f"Writing {filename}.bsi animation descramble data...")
-                with open(f"{filename}.bsi", "wb") as bfp:
-                    bfp.write(swf.descramble_info)
-
-        for i, name in enumerate(afpfile.shapemap.entries):
-            shape = afpfile.shapes[i]
-            filename = os.path.join(output_dir, f"{name}.geo")
-
-            if pretend:
-                print(f"Would write {filename} shape data...")
-            else:
-                print(f"Writing {filename} shape data...")
-                with open(filename, "wb") as bfp:
-                    bfp.write(shape.data)
-
-    if generate_mapping_overlays:
-        overlays: Dict[str, Any] = {}
-
-        for i, name in enumerate(afpfile.regionmap.entries):
-            if i < 0 or i >= len(afpfile.texture_to_region):
-                raise Exception(f"Out of bounds region {i}")
-            region = afpfile.texture_to_region[i]
-            texturename = afpfile.texturemap.entries[region.textureno]
-
-            if texturename not in overlays:
-                for texture in afpfile.textures:
-                    if texture.name == texturename:
-                        overlays[texturename] = Image.new(
-                            'RGBA',
-                            (texture.width, texture.height),
-                            (0, 0, 0, 0),
-                        )
-                        break
-                else:
-                    raise Exception(f"Couldn't find texture {texturename}")
-
-            draw = ImageDraw.Draw(overlays[texturename])
-            draw.rectangle(
-                ((region.left // 2, region.top // 2), (region.right // 2, region.bottom // 2)),
-                fill=(0, 0, 0, 0),
-                outline=(255, 0, 0, 255),
-                width=1,
-            )
-            draw.text(
-                (region.left // 2, region.top // 2),
-                name,
-                fill=(255, 0, 255, 255),
-            )
+                    print(f"Writing {filename}.afp animation data...")
+                    output.write(f"{filename}.afp", swf.data)
+                    print(f"Writing {filename}.bsi animation descramble data...")
+                    output.write(f"{filename}.bsi", swf.descramble_info)
 
-        for name, img in overlays.items():
-            filename = os.path.join(output_dir, name) + "_overlay.png"
-            if pretend:
-                print(f"Would write {filename} overlay...")
-            else:
-                print(f"Writing {filename} overlay...")
-                with open(filename, "wb") as bfp:
-                    img.save(bfp, format='PNG')
+            for i, name in enumerate(afpfile.shapemap.entries):
+                shape = afpfile.shapes[i]
+                filename = os.path.join(output.directory, f"{name}.geo")
 
-    if split_textures:
-        textures: Dict[str, Any] = {}
-        announced: Dict[str, bool] = {}
-
-        for i, name in enumerate(afpfile.regionmap.entries):
-            if i < 0 or i >= len(afpfile.texture_to_region):
-                raise Exception(f"Out of bounds region {i}")
-            region = afpfile.texture_to_region[i]
-            texturename = afpfile.texturemap.entries[region.textureno]
-
-            if texturename not in textures:
-                for tex in afpfile.textures:
-                    if tex.name == texturename:
-                        textures[texturename] = tex
-                        break
+                if pretend:
+                    print(f"Would write {filename} shape data...")
                 else:
-                    raise Exception("Could not find texture {texturename} to split!")
+                    print(f"Writing {filename} shape data...")
+                    output.write(filename, shape.data)
 
-            if textures[texturename].img:
-                # Grab the location in the image, save it out to a new file.
-                filename = f"{texturename}_{name}.png"
-                filename = os.path.join(output_dir, filename)
+        if generate_mapping_overlays:
+            overlays: Dict[str, Any] = {}
+            draws: Dict[str, Any] = {}
+
+            for name, region, texturename in region_mapping(afpfile):
+                if texturename not in overlays:
+                    if texturename not in textures_by_name:
+                        raise Exception(f"Couldn't find texture {texturename}")
+                    texture = textures_by_name[texturename]
+                    overlays[texturename] = Image.new(
+                        'RGBA',
+                        (texture.width, texture.height),
+                        (0, 0, 0, 0),
+                    )
+                    draws[texturename] = ImageDraw.Draw(overlays[texturename])
+
+                draw = draws[texturename]
+                draw.rectangle(
+                    ((region.left // 2, region.top // 2), (region.right // 2, region.bottom // 2)),
+                    fill=(0, 0, 0, 0),
+                    outline=(255, 0, 0, 255),
+                    width=1,
+                )
+                draw.text(
+                    (region.left // 2, region.top // 2),
+                    name,
+                    fill=(255, 0, 255, 255),
+                )
 
+            for name, img in overlays.items():
+                filename = os.path.join(output.directory, name) + "_overlay.png"
                 if pretend:
-                    print(f"Would write {filename} sprite...")
+                    print(f"Would write {filename} overlay...")
                 else:
-                    print(f"Writing {filename} sprite...")
-                    sprite = textures[texturename].img.crop(
-                        (region.left // 2, region.top // 2, region.right // 2, region.bottom // 2),
-                    )
-                    with open(filename, "wb") as bfp:
-                        sprite.save(bfp, format='PNG')
+                    print(f"Writing {filename} overlay...")
+                    output.write(filename, encode_png(img, fast=True))
+
+        if split_textures:
+            announced: Dict[str, bool] = {}
+            last_texturename: Optional[str] = None
+            sprites: List[Tuple[Image.Image, TextureRegion, str]] = []
+
+            # Walk the regions grouped by texture so that we crop every sprite out of
+            # a single texture before moving on to the next one. The sort is stable so
+            # sprites within a texture are still written in region order.
+            for name, region, texturename in sorted(region_mapping(afpfile), key=lambda r: r[2]):
+                if texturename not in textures_by_name:
+                    raise Exception(f"Could not find texture {texturename} to split!")
+
+                if textures_by_name[texturename].img:
+                    if texturename != last_texturename:
+                        # Make sure the texture is fully decoded before we start cropping from it.
+                        textures_by_name[texturename].img.load()
+                        last_texturename = texturename
+
+                    # Grab the location in the image, save it out to a new file.
+                    filename = f"{texturename}_{name}.png"
+                    filename = os.path.join(output.directory, filename)
+
+                    if pretend:
+                        print(f"Would write {filename} sprite...")
+                    else:
+                        print(f"Writing {filename} sprite...")
+                        sprites.append((textures_by_name[texturename].img, region, filename))
+                else:
+                    if not announced.get(texturename, False):
+                        print(f"Cannot extract sprites from {texturename} because it is not a supported format!")
+                        announced[texturename] = True
+
+            # Cropping and PNG encoding both happen in PIL without holding the GIL, so
+            # spread the actual sprite writes across threads unless asked not to.
+            if disable_threads:
+                for sprite in sprites:
+                    write_sprite(output, *sprite)
             else:
-                if not announced.get(texturename, False):
-                    print(f"Cannot extract sprites from {texturename} because it is not a supported format!")
-                    announced[texturename] = True
-    if write_bytecode:
-        for swf in afpfile.swfdata:
-            write_bytecode(swf, output_dir, verbose=verbose)
+                with concurrent.futures.ThreadPoolExecutor() as executor:
+                    # Consume the results so that any exception in a worker is raised here.
+                    list(executor.map(lambda sprite: write_sprite(output, *sprite), sprites))
+
+        if write_bytecode:
+            for swf in afpfile.swfdata:
+                write_decompiled_bytecode(swf, output, pretend=pretend, verbose=verbose)
 
     return 0
 
 
 def update_txp2(fname: str, update_dir: str, *, pretend: bool=False, verbose: bool=False) -> int:
     # First, parse the file out
-    with open(fname, "rb") as bfp:
+    with open(fname, "rb", buffering=FILE_BUFFER_SIZE) as bfp:
         afpfile = TXP2File(bfp.read(), verbose=verbose)
 
+    # Scan the update directory once rather than checking for every texture and
+    # sprite individually, since most of them won't have a replacement. Names are
+    # compared without case and candidates are then checked on disk, so that matches
+    # follow whatever case rules the filesystem itself has.
+    try:
+        with os.scandir(update_dir) as entries:
+            pngfiles = {entry.name.lower() for entry in entries if entry.name.lower().endswith(".png")}
+    except (FileNotFoundError, NotADirectoryError):
+        # Nothing to update from, but still write the file back out like normal.
+        pngfiles = set()
+
     # Now, find any PNG files that match texture names.
     for texture in afpfile.textures:
         filename = os.path.join(update_dir, texture.name) + ".png"
 
-        if os.path.isfile(filename):
+        if (texture.name + ".png").lower() in pngfiles and os.path.isfile(filename):
             print(f"Updating {texture.name} from {filename}...")
 
-            with open(filename, "rb") as bfp:
+            with open(filename, "rb", buffering=FILE_BUFFER_SIZE) as bfp:
                 afpfile.update_texture(texture.name, bfp.read())
 
     # Now, find any PNG files that match a specific sprite.
-    for i, spritename in enumerate(afpfile.regionmap.entries):
-        if i < 0 or i >= len(afpfile.texture_to_region):
-            raise Exception(f"Out of bounds region {i}")
-        region = afpfile.texture_to_region[i]
-        texturename = afpfile.texturemap.entries[region.textureno]
-
+    for spritename, _, texturename in region_mapping(afpfile):
         # Grab the location in the image to see if it exists.
-        filename = f"{texturename}_{spritename}.png"
-        filename = os.path.join(update_dir, filename)
+        basename = f"{texturename}_{spritename}.png"
+        filename = os.path.join(update_dir, basename)
 
-        if os.path.isfile(filename):
+        if basename.lower() in pngfiles and os.path.isfile(filename):
             print(f"Updating {texturename} sprite piece {spritename} from {filename}...")
 
-            with open(filename, "rb") as bfp:
+            with open(filename, "rb", buffering=FILE_BUFFER_SIZE) as bfp:
                 afpfile.update_sprite(texturename, spritename, bfp.read())
 
     # Now, write out the updated file
     if pretend:
+        # Serializing the whole container is expensive, so don't bother when we
+        # aren't going to write it anywhere.
         print(f"Would write {fname}...")
-        afpfile.unparse()
     else:
         print(f"Writing {fname}...")
         data = afpfile.unparse()
-        with open(fname, "wb") as bfp:
+        with open(fname, "wb", buffering=FILE_BUFFER_SIZE) as bfp:
             bfp.write(data)
 
     return 0
@@ -332,67 +489,90 @@ def update_txp2(fname: str, update_dir: str, *, pretend: bool=False, verbose: bo
 
 def print_txp2(fname: str, *, decompile_bytecode: bool=False, verbose: bool=False) -> int:
     # First, parse the file out
-    with open(fname, "rb") as bfp:
-        afpfile = TXP2File(bfp.read(), verbose=verbose)
+    with mapped_file(fname) as data:
+        afpfile = TXP2File(data, verbose=verbose)
 
     # Now, print it
-    print(json.dumps(afpfile.as_dict(decompile_bytecode=decompile_bytecode, verbose=verbose), sort_keys=True, indent=4))
+    print_json(afpfile.as_dict(decompile_bytecode=decompile_bytecode, verbose=verbose))
 
     return 0
 
 
 def parse_afp(afp: str, bsi: str, *, decompile_bytecode: bool=False, verbose: bool=False) -> int:
     # First, load the AFP and BSI files
-    with open(afp, "rb") as bafp:
-        with open(bsi, "rb") as bbsi:
+    with open(afp, "rb", buffering=FILE_BUFFER_SIZE) as bafp:
+        with open(bsi, "rb", buffering=FILE_BUFFER_SIZE) as bbsi:
             swf = SWF("<unnamed>", bafp.read(), bbsi.read())
 
     # Now, print it
     swf.parse(verbose=verbose)
-    print(json.dumps(swf.as_dict(decompile_bytecode=decompile_bytecode, verbose=verbose), sort_keys=True, indent=4))
+    print_json(swf.as_dict(decompile_bytecode=decompile_bytecode, verbose=verbose))
 
     return 0
 
 
 def decompile_afp(afp: str, bsi: str, output_dir: str, *, verbose: bool=False) -> int:
     # First, load the AFP and BSI files
-    with open(afp, "rb") as bafp:
-        with open(bsi, "rb") as bbsi:
+    with open(afp, "rb", buffering=FILE_BUFFER_SIZE) as bafp:
+        with open(bsi, "rb", buffering=FILE_BUFFER_SIZE) as bbsi:
             swf = SWF("<unnamed>", bafp.read(), bbsi.read())
 
     # Now, decompile it
     swf.parse(verbose=verbose)
-    write_bytecode(swf, output_dir, verbose=verbose)
+    write_decompiled_bytecode(swf, ExtractOutput(output_dir), verbose=verbose)
 
     return 0
 
 
 def parse_geo(geo: str, *, verbose: bool=False) -> int:
     # First, load the AFP and BSI files
-    with open(geo, "rb") as bfp:
+    with open(geo, "rb", buffering=FILE_BUFFER_SIZE) as bfp:
         shape = Shape("<unnamed>", bfp.read())
 
     # Now, print it
     shape.parse()
     if verbose:
         print(shape, file=sys.stderr)
-    print(json.dumps(shape.as_dict(), sort_keys=True, indent=4))
+    print_json(shape.as_dict())
 
     return 0
 
 
+def parse_container(container: str, *, verbose: bool) -> Tuple[Optional[TXP2File], Optional[IFS]]:
+    with mapped_file(container) as data:
+        # Only hand the container to the parser whose signature it matches, instead
+        # of letting the wrong one fail part of the way through.
+        magic = data[:4]
+
+        if magic in TXP2_MAGIC:
+            try:
+                return TXP2File(data, verbose=verbose), None
+            except Exception:
+                pass
+        elif magic == IFS_MAGIC:
+            try:
+                return None, IFS(data, decode_textures=True)
+            except Exception:
+                pass
+
+    return None, None
+
+
 def load_containers(renderer: AFPRenderer, containers: List[str], *, need_extras: bool, verbose: bool) -> None:
     # This is a complicated one, as we need to be able to specify multiple
     # directories of files as well as support IFS files and TXP2 files.
-    for container in containers:
-        with open(container, "rb") as bfp:
-            data = bfp.read()
+    # The same container is sometimes passed more than once, so remember what
+    # we parsed for each file and only re-register it with the renderer.
+    parsed: Dict[Tuple[str, int, int], Tuple[Optional[TXP2File], Optional[IFS]]] = {}
 
-        afpfile = None
-        try:
-            afpfile = TXP2File(data, verbose=verbose)
-        except Exception:
-            pass
+    for container in containers:
+        stat = os.stat(container)
+        key = (os.path.abspath(container), stat.st_mtime_ns, stat.st_size)
+        if key in parsed:
+            afpfile, ifsfile = parsed[key]
+        else:
+            afpfile, ifsfile = parse_container(container, verbose=verbose)
+            parsed[key] = (afpfile, ifsfile)
 
         if afpfile is not None:
             if verbose:
@@ -408,24 +588,29 @@ def load_containers(renderer: AFPRenderer, containers: List[str], *, need_extras
                         print(f"Added {name} to animation shape library.", file=sys.stderr)
 
                 # Now, split and load textures into the renderer.
-                sheets: Dict[str, Any] = {}
-
-                for i, name in enumerate(afpfile.regionmap.entries):
-                    if i < 0 or i >= len(afpfile.texture_to_region):
-                        raise Exception(f"Out of bounds region {i}")
-                    region = afpfile.texture_to_region[i]
-                    texturename = afpfile.texturemap.entries[region.textureno]
+                sheets: Dict[str, Texture] = {tex.name: tex for tex in afpfile.textures}
+                last_sheetname: Optional[str] = None
+                sheet: Optional[Image.Image] = None
 
+                # Group the regions by texture so we crop every sprite out of one sheet
+                # before moving on to the next.
+                for name, region, texturename in sorted(region_mapping(afpfile), key=lambda r: r[2]):
                     if texturename not in sheets:
-                        for tex in afpfile.textures:
-                            if tex.name == texturename:
-                                sheets[texturename] = tex
-                                break
-                        else:
-                            raise Exception("Could not find texture {texturename} to split!")
+                        raise Exception(f"Could not find texture {texturename} to split!")
 
                     if sheets[texturename].img:
-                        sprite = sheets[texturename].img.crop(
+                        if texturename != last_sheetname:
+                            # Make sure the sheet is fully decoded and in the renderer's native mode
+                            # before we start cropping from it. That way every sprite comes out of the
+                            # crop ready to use, and the renderer doesn't need to make a second copy.
+                            sheet = sheets[texturename].img
+                            if sheet.mode == "RGBA":
+                                sheet.load()
+                            else:
+                                sheet = sheet.convert("RGBA")
+                            last_sheetname = texturename
+
+                        sprite = sheet.crop(
                             (region.left // 2, region.top // 2, region.right // 2, region.bottom // 2),
                         )
                         renderer.add_texture(name, sprite)
@@ -445,22 +630,26 @@ def load_containers(renderer: AFPRenderer, containers: List[str], *, need_extras
 
             continue
 
-        ifsfile = None
-        try:
-            ifsfile = IFS(data, decode_textures=True)
-        except Exception:
-            pass
-
         if ifsfile is not None:
             if verbose:
                 print(f"Loading files out of IFS container {container}...", file=sys.stderr)
-            for fname in ifsfile.filenames:
-                if fname.startswith(f"geo{os.sep}"):
+
+            # The file listing is rebuilt on every access, so grab it once and keep a set
+            # around for looking up the matching bsi file for each afp file.
+            filenames = ifsfile.filenames
+            filenames_set = set(filenames)
+            geo_prefix = f"geo{os.sep}"
+            tex_prefix = f"tex{os.sep}"
+            afp_prefix = f"afp{os.sep}"
+            bsi_prefix = f"afp{os.sep}bsi{os.sep}"
+
+            for fname in filenames:
+                if fname.startswith(geo_prefix):
                     if not need_extras:
                         continue
 
                     # Trim off directory.
-                    shapename = fname[(3 + len(os.sep)):]
+                    shapename = fname[len(geo_prefix):]
 
                     # Load file, register it.
                     fdata = ifsfile.read_file(fname)
@@ -469,12 +658,12 @@ def load_containers(renderer: AFPRenderer, containers: List[str], *, need_extras
 
                     if verbose:
                         print(f"Added {shapename} to animation shape library.", file=sys.stderr)
-                elif fname.startswith(f"tex{os.sep}") and fname.endswith(".png"):
+                elif fname.startswith(tex_prefix) and fname.endswith(".png"):
                     if not need_extras:
                         continue
 
                     # Trim off directory, png extension.
-                    texname = fname[(3 + len(os.sep)):][:-4]
+                    texname = fname[len(tex_prefix):-4]
 
                     # Load file, register it.
                     fdata = ifsfile.read_file(fname)
@@ -483,12 +672,12 @@ def load_containers(renderer: AFPRenderer, containers: List[str], *, need_extras
 
                     if verbose:
                         print(f"Added {texname} to animation texture library.", file=sys.stderr)
-                elif fname.startswith(f"afp{os.sep}"):
+                elif fname.startswith(afp_prefix):
                     # Trim off directory, see if it has a corresponding bsi.
-                    afpname = fname[(3 + len(os.sep)):]
-                    bsipath = f"afp{os.sep}bsi{os.sep}{afpname}"
+                    afpname = fname[len(afp_prefix):]
+                    bsipath = bsi_prefix + afpname
 
-                    if bsipath in ifsfile.filenames:
+                    if bsipath in filenames_set:
                         afpdata = ifsfile.read_file(fname)
                         bsidata = ifsfile.read_file(bsipath)
                         flash = SWF(afpname, afpdata, bsidata)
@@ -555,6 +744,192 @@ def adjust_background_loop(
     return background[background_loop_offset:] + background[:background_loop_offset]
 
 
+def encode_frames(
+    frames: Iterator[Image.Image],
+    encode: Callable[[Iterator[Image.Image]], None],
+    maxsize: int,
+    *,
+    verbose: bool = False,
+) -> None:
+    # Encode frames on a background thread while the caller keeps rendering new ones. The
+    # rendering itself stays on the calling thread, since the renderer installs signal
+    # handlers and expects ctrl-c to land inside it, and both only work on the main thread.
+    # The queue is bounded so a slow encoder holds the renderer back instead of letting
+    # rendered frames pile up in memory.
+    pending: "queue.Queue[Optional[Image.Image]]" = queue.Queue(maxsize=maxsize)
+    finished = threading.Event()
+    aborted = threading.Event()
+    failures: List[BaseException] = []
+    warned = False
+
+    def images() -> Iterator[Image.Image]:
+        while True:
+            img = pending.get()
+            if img is None:
+                if aborted.is_set():
+                    raise Exception("Rendering failed, abandoning encode!")
+                return
+            yield img
+
+    def consume() -> None:
+        try:
+            encode(images())
+        except BaseException as e:
+            failures.append(e)
+        finally:
+            finished.set()
+
+    def put(img: Optional[Image.Image]) -> bool:
+        nonlocal warned
+
+        # Don't block forever if the encoder went away, such as when encoding fails.
+        while not finished.is_set():
+            try:
+                pending.put(img, timeout=0.1)
+                return True
+            except queue.Full:
+                if verbose and not warned:
+                    print(f"Rendering is waiting on the encoder, {maxsize} frames are already buffered.", file=sys.stderr)
+                    warned = True
+        return False
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+
+    try:
+        for img in frames:
+            if not put(img):
+                break
+    except KeyboardInterrupt:
+        # Ctrl-c while we were waiting on the encoder rather than rendering. Treat it the
+        # same way the renderer does and finish up with the frames we already have.
+        print("WARNING: Interrupted early, will encode only the frames rendered so far!")
+    except BaseException:
+        aborted.set()
+        put(None)
+        consumer.join()
+        raise
+
+    put(None)
+    consumer.join()
+    if failures:
+        raise failures[0]
+
+
+def write_frame(img: Image.Image, filename: str, fmt: str) -> None:
+    with open(filename, "wb", buffering=FILE_BUFFER_SIZE) as bfp:
+        if fmt == "RAW":
+            # Raw frames skip encoding entirely and are just the RGBA framebuffer.
+            if img.mode != "RGBA":
+                img = img.convert("RGBA")
+            bfp.write(img.tobytes("raw", "RGBA"))
+        else:
+            img.save(bfp, format=fmt)
+
+
+def write_gifsicle(gifsicle: str, output: str, images: Iterator[Image.Image], duration: int, optimize: bool) -> None:
+    # PIL's GIF optimizer is very slow and still produces large files, so when gifsicle is
+    # available we hand it each frame as a standalone GIF and let it merge and optimize
+    # them into one animation. Frames are full images, so each one replaces the last.
+    proc = subprocess.Popen(
+        [
+            gifsicle,
+            "--multifile",
+            "--merge",
+            *(["-O3"] if optimize else []),
+            f"--delay={int(duration / 10)}",
+            "--disposal=background",
+            "-",
+            "-o",
+            output,
+        ],
+        stdin=subprocess.PIPE,
+    )
+    stdin = proc.stdin
+    assert stdin is not None
+
+    try:
+        for img in images:
+            img.save(stdin, format="GIF")
+    except BrokenPipeError:
+        # Gifsicle bailed out early, its exit status below will reflect that.
+        pass
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            # Flushing the last frame to an exited gifsicle can fail the same way.
+            pass
+
+    if proc.wait() != 0:
+        raise Exception(f"Failed to write {output} using gifsicle!")
+
+
+def write_gif(output: str, first: Image.Image, images: Iterator[Image.Image], duration: int, optimize: bool) -> None:
+    # Frames are deliberately handed over as RGBA rather than quantized up front. The encoder
+    # palettizes each frame as it consumes it and keeps only that copy, and PIL can't map
+    # RGBA frames onto a shared palette, so a palette borrowed from one frame would both
+    # lose transparency and wreck any animation whose colors change over time.
+    gifsicle = shutil.which("gifsicle")
+    if gifsicle is not None:
+        write_gifsicle(gifsicle, output, itertools.chain([first], images), duration, optimize)
+    else:
+        with open(output, "wb", buffering=FILE_BUFFER_SIZE) as bfp:
+            # Every frame is a full image, so clear each one to the background before drawing
+            # the next instead of leaving PIL to work out a disposal method on its own.
+            first.save(bfp, format="GIF", save_all=True, append_images=images, duration=duration, optimize=optimize, disposal=2)
+
+
+def write_webp(
+    output: str,
+    first: Image.Image,
+    images: Iterator[Image.Image],
+    duration: int,
+    *,
+    quality: int,
+    method: int,
+    lossless: bool,
+) -> None:
+    # PIL hands frames to libwebp's animation encoder one at a time, which takes care
+    # of merging identical frames and picking keyframes. It does gather up the rest of
+    # the frames before starting, unlike GIF output which consumes them as it goes. There
+    # is no optimize pass to request here, PIL's WebP writer ignores that option.
+    with open(output, "wb", buffering=FILE_BUFFER_SIZE) as bfp:
+        first.save(
+            bfp,
+            format="WEBP",
+            save_all=True,
+            append_images=images,
+            duration=duration,
+            quality=quality,
+            method=method,
+            lossless=lossless,
+            minimize_size=False,
+        )
+
+
+@contextmanager
+def replace_on_success(output: str) -> Iterator[str]:
+    # Frames are encoded while they are still being rendered, so write to a temporary file
+    # alongside the output and only move it into place once it is complete. That way a
+    # failed render doesn't leave a truncated file behind or clobber a previous render.
+    dirof, name = os.path.split(os.path.abspath(output))
+    tmpname = os.path.join(dirof, f".{name}.{os.getpid()}.tmp")
+    try:
+        yield tmpname
+        os.replace(tmpname, output)
+    except BaseException:
+        try:
+            os.remove(tmpname)
+        except FileNotFoundError:
+            pass
+        raise
+
+
 def render_path(
     containers: List[str],
     path: str,
@@ -562,6 +937,11 @@ def render_path(
     *,
     disable_threads: bool = False,
     enable_anti_aliasing: bool = False,
+    optimize: bool = True,
+    max_buffered_frames: int = 50,
+    webp_quality: int = 80,
+    webp_method: int = 0,
+    webp_lossless: bool = False,
     background_color: Optional[str] = None,
     background_image: Optional[str] = None,
     background_loop_start: Optional[int] = None,
@@ -593,8 +973,16 @@ def render_path(
         fmt = "WEBP"
     elif output.lower().endswith(".png"):
         fmt = "PNG"
+    elif output.lower().endswith(".raw"):
+        fmt = "RAW"
     else:
         raise Exception("Unrecognized file extension for output!")
+    if max_buffered_frames < 1:
+        raise Exception("Must buffer at least one frame while rendering!")
+    if webp_quality < 0 or webp_quality > 100:
+        raise Exception("WebP quality must be between 0 and 100!")
+    if webp_method < 0 or webp_method > 6:
+        raise Exception("WebP method must be between 0 and 6!")
 
     # Allow overriding background color.
     if background_color:
@@ -602,14 +990,16 @@ def render_path(
         if len(colorvals) not in [3, 4]:
             raise Exception("Invalid color, specify a color as a comma-separated RGB or RGBA value!")
 
-        if len(colorvals) == 3:
-            colorvals.append("255")
-        colorints = [int(c.strip()) for c in colorvals]
-        for c in colorints:
-            if c < 0 or c > 255:
-                raise Exception("Color values should be between 0 and 255!")
+        colorints = tuple(int(c.strip()) for c in colorvals)
+        if any(c < 0 or c > 255 for c in colorints):
+            raise Exception("Color values should be between 0 and 255!")
 
-        color = Color(*[c / 255.0 for c in colorints])
+        color = Color(
+            colorints[0] / 255.0,
+            colorints[1] / 255.0,
+            colorints[2] / 255.0,
+            colorints[3] / 255.0 if len(colorints) == 4 else 1.0,
+        )
     else:
         color = None
 
@@ -620,7 +1010,7 @@ def render_path(
 
         if os.path.isfile(background_image):
             # This is a direct reference, open it.
-            with open(background_image, "rb") as bfp:
+            with open(background_image, "rb", buffering=FILE_BUFFER_SIZE) as bfp:
                 # Work around the fact that PIL does not read the image until first use,
                 # meaning a long background image sequence can blow past max open files.
                 bgimg = Image.open(io.BytesIO(bfp.read()))
@@ -664,7 +1054,7 @@ def render_path(
 
             # Now that we have the list, lets load the images!
             for filename in filenames:
-                with open(filename, "rb") as bfp:
+                with open(filename, "rb", buffering=FILE_BUFFER_SIZE) as bfp:
                     # Work around the fact that PIL does not read the image until first use,
                     # meaning a long background image sequence can blow past max open files.
                     bgimg = Image.open(io.BytesIO(bfp.read()))
@@ -688,8 +1078,9 @@ def render_path(
 
     # Calculate the size of the animation so we can apply scaling options.
     swf_location = renderer.compute_path_location(path)
-    requested_width = force_width if force_width is not None else swf_location.width
-    requested_height = force_height if force_height is not None else swf_location.height
+    swf_width, swf_height = swf_location.width, swf_location.height
+    requested_width = force_width if force_width is not None else swf_width
+    requested_height = force_height if force_height is not None else swf_height
 
     # Allow overriding the aspect ratio.
     if force_aspect_ratio:
@@ -702,20 +1093,20 @@ def render_path(
             raise Exception("Ratio must only include positive numbers!")
 
         actual_ratio = rx / ry
-        swf_ratio = swf_location.width / swf_location.height
+        swf_ratio = swf_width / swf_height
 
         if abs(swf_ratio - actual_ratio) > 0.0001:
-            new_width = actual_ratio * swf_location.height
-            new_height = swf_location.width / actual_ratio
+            new_width = actual_ratio * swf_height
+            new_height = swf_width / actual_ratio
 
-            if new_width < swf_location.width and new_height < swf_location.height:
+            if new_width < swf_width and new_height < swf_height:
                 raise Exception("Impossible aspect ratio!")
-            if new_width > swf_location.width and new_height > swf_location.height:
+            if new_width > swf_width and new_height > swf_height:
                 raise Exception("Impossible aspect ratio!")
 
             # We know that one is larger and one is smaller, pick the larger.
             # This way we always stretch instead of shrinking.
-            if new_width > swf_location.width:
+            if new_width > swf_width:
                 requested_width = new_width
             else:
                 requested_height = new_height
@@ -726,10 +1117,10 @@ def render_path(
 
     # Calculate the overall view matrix based on the requested width/height.
     transform = Matrix.affine(
-        a=requested_width / swf_location.width,
+        a=requested_width / swf_width,
         b=0.0,
         c=0.0,
-        d=requested_height / swf_location.height,
+        d=requested_height / swf_height,
         tx=0.0,
         ty=0.0,
     )
@@ -750,24 +1141,31 @@ def render_path(
         # Write all the frames out in one file.
         duration = renderer.compute_path_frame_duration(path)
         frames = renderer.compute_path_frames(path)
-        images: List[Image] = []
-        for i, img in enumerate(
-            renderer.render_path(
-                path,
-                verbose=verbose,
-                background_color=color,
-                background_image=background,
-                only_depths=requested_depths,
-                only_frames=requested_frames,
-                movie_transform=transform,
-            )
-        ):
-            if show_progress:
-                frameno = requested_frames[i] if requested_frames is not None else (i + 1)
-                print(f"Rendered animation frame {frameno}/{frames}.")
-            images.append(img)
 
-        if len(images) > 0:
+        def rendered_frames() -> Iterator[Image.Image]:
+            for i, img in enumerate(
+                renderer.render_path(
+                    path,
+                    verbose=verbose,
+                    background_color=color,
+                    background_image=background,
+                    only_depths=requested_depths,
+                    only_frames=requested_frames,
+                    movie_transform=transform,
+                )
+            ):
+                if show_progress:
+                    frameno = requested_frames[i] if requested_frames is not None else (i + 1)
+                    print(f"Rendered animation frame {frameno}/{frames}.")
+                yield img
+
+        # Feed frames to the encoder as they are rendered instead of holding every full
+        # color frame in memory until the end. The first frame is pulled up front since
+        # PIL saves starting from an image, and so we don't write out an empty animation.
+        images = rendered_frames()
+        first = next(images, None)
+
+        if first is not None:
             try:
                 dirof = os.path.dirname(os.path.abspath(output))
                 os.makedirs(dirof, exist_ok=True)
@@ -775,8 +1173,25 @@ def render_path(
                 # Apparently on OSX this is possible?
                 pass
 
-            with open(output, "wb") as bfp:
-                images[0].save(bfp, format=fmt, save_all=True, append_images=images[1:], duration=duration, optimize=True)
+            def encode(rest: Iterator[Image.Image]) -> None:
+                with replace_on_success(output) as tmpname:
+                    if fmt == "GIF":
+                        write_gif(tmpname, first, rest, duration, optimize)
+                    else:
+                        write_webp(
+                            tmpname,
+                            first,
+                            rest,
+                            duration,
+                            quality=webp_quality,
+                            method=webp_method,
+                            lossless=webp_lossless,
+                        )
+
+            if disable_threads:
+                encode(images)
+            else:
+                encode_frames(images, encode, max_buffered_frames, verbose=verbose)
 
             print(f"Wrote animation to {output}")
     else:
@@ -787,33 +1202,72 @@ def render_path(
         # Figure out padding for the images.
         frames = renderer.compute_path_frames(path)
         if frames > 0:
-            digits = f"0{int(math.log10(frames)) + 1}"
+            # Build the per-frame filename template once, escaping anything in the output
+            # path that would otherwise be mistaken for a placeholder.
+            template = (
+                filename.replace("{", "{{").replace("}", "}}") +
+                f"-{{:0{len(str(frames))}d}}" +
+                ext.replace("{", "{{").replace("}", "}}")
+            )
 
-            for i, img in enumerate(
-                renderer.render_path(
-                    path,
-                    verbose=verbose,
-                    background_color=color,
-                    background_image=background,
-                    only_depths=requested_depths,
-                    only_frames=requested_frames,
-                    movie_transform=transform,
-                )
-            ):
-                frameno = requested_frames[i] if requested_frames is not None else (i + 1)
-                fullname = f"{filename}-{frameno:{digits}}{ext}"
+            try:
+                dirof = os.path.dirname(os.path.abspath(filename))
+                os.makedirs(dirof, exist_ok=True)
+            except FileNotFoundError:
+                # Apparently on OSX this is possible?
+                pass
 
-                try:
-                    dirof = os.path.dirname(os.path.abspath(fullname))
-                    os.makedirs(dirof, exist_ok=True)
-                except FileNotFoundError:
-                    # Apparently on OSX this is possible?
-                    pass
+            # Encoding happens in PIL without holding the GIL, so hand each frame off to a
+            # pool of writers while we render the next one. Only a couple of frames per
+            # writer are allowed to be in flight so that memory use stays bounded. When
+            # threads are disabled, frames are written inline and no writers are spawned.
+            workers = os.cpu_count() or 1
+            inflight = min(workers * 2, max_buffered_frames)
+            warned = False
+            pending: Deque[Tuple[str, "concurrent.futures.Future[None]"]] = deque()
+            executor = None if disable_threads else concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+            def finish_frame() -> None:
+                fullname, future = pending.popleft()
+                future.result()
+                print(f"Wrote animation frame to {fullname}")
+
+            try:
+                for i, img in enumerate(
+                    renderer.render_path(
+                        path,
+                        verbose=verbose,
+                        background_color=color,
+                        background_image=background,
+                        only_depths=requested_depths,
+                        only_frames=requested_frames,
+                        movie_transform=transform,
+                    )
+                ):
+                    frameno = requested_frames[i] if requested_frames is not None else (i + 1)
+                    fullname = template.format(frameno)
+                    if fmt == "RAW" and i == 0:
+                        # Raw frames have no header, so let the user know how to interpret them.
+                        print(f"Writing raw frames as {img.width}x{img.height} 8-bit RGBA")
+
+                    if executor is None:
+                        write_frame(img, fullname, fmt)
+                        print(f"Wrote animation frame to {fullname}")
+                        continue
 
-                with open(fullname, "wb") as bfp:
-                    img.save(bfp, format=fmt)
+                    pending.append((fullname, executor.submit(write_frame, img, fullname, fmt)))
 
-                print(f"Wrote animation frame to {fullname}")
+                    if len(pending) > inflight and verbose and not warned:
+                        print(f"Rendering is waiting on the writers, {inflight} frames are already buffered.", file=sys.stderr)
+                        warned = True
+                    while len(pending) > inflight:
+                        finish_frame()
+
+                while pending:
+                    finish_frame()
+            finally:
+                if executor is not None:
+                    executor.shutdown()
 
     return 0
 
@@ -835,7 +1289,7 @@ def main() -> int:
     extract_parser.add_argument(
         "dir",
         metavar="DIR",
-        help="The directory to extract all contents to",
+        help="The directory to extract all contents to, or the zip file to create when --archive is specified",
     )
     extract_parser.add_argument(
         "-p",
@@ -885,6 +1339,17 @@ def main() -> int:
         action="store_true",
         help="Write decompiled bytecode files found in AFP files to disk",
     )
+    extract_parser.add_argument(
+        "-a",
+        "--archive",
+        action="store_true",
+        help="Write all extracted files into a single uncompressed zip archive named DIR instead of into a directory",
+    )
+    extract_parser.add_argument(
+        "--disable-threads",
+        action="store_true",
+        help="Disable multi-threaded sprite extraction. Sprites will be split and written on a single core and threads will not be spawned.",
+    )
 
     update_parser = subparsers.add_parser(
         'update',
@@ -1054,12 +1519,67 @@ def main() -> int:
         type=str,
         default="out.gif",
         help=(
-            'The output file (ending either in .gif, .webp or .png) where the render should be saved. If .png is chosen then the '
-            'output will be a series of png files for each rendered frame. If .gif or .webp is chosen the output will be an '
+            'The output file (ending either in .gif, .webp, .png or .raw) where the render should be saved. If .png is chosen then the '
+            'output will be a series of png files for each rendered frame. If .raw is chosen then the output will be a series '
+            'of headerless 8-bit RGBA framebuffer dumps for each rendered frame, skipping image encoding entirely, suitable '
+            'for feeding to tools such as ffmpeg as rawvideo. If .gif or .webp is chosen the output will be an '
             'animated image. Note that the .gif file format has several severe limitations which result in sub-optimal animations '
-            'so it is recommended to use .webp or .png instead.'
+            'so it is recommended to use .webp or .png instead. If gifsicle is found on the PATH, it will be used to assemble and '
+            'optimize .gif output.'
+        ),
+    )
+    render_parser.add_argument(
+        "--optimize",
+        dest="optimize",
+        action="store_true",
+        default=True,
+        help=(
+            "Optimize animated .gif output for size. This is the default. Optimizing is slow, so turn it off with "
+            "--no-optimize for quick previews. Animated .webp output is not affected by this setting."
+        ),
+    )
+    render_parser.add_argument(
+        "--no-optimize",
+        dest="optimize",
+        action="store_false",
+        help="Skip optimizing animated .gif output, trading a larger file for a much faster save.",
+    )
+    render_parser.add_argument(
+        "--max-buffered-frames",
+        type=int,
+        default=50,
+        help=(
+            "The maximum number of rendered frames that can be waiting to be written out before rendering pauses. For "
+            ".png and .raw output, and for .gif output assembled by gifsicle, this bounds how many rendered frames are "
+            "held in memory, and a value of 2 is enough to keep gifsicle busy. Animated .webp output, and .gif output "
+            "when gifsicle is not available, still keep a copy of every frame until the file is written, so for those "
+            "this only limits how far rendering can run ahead of the encoder. Defaults to 50 frames."
+        ),
+    )
+    render_parser.add_argument(
+        "--webp-quality",
+        type=int,
+        default=80,
+        help=(
+            "The quality, from 0 to 100, to encode animated .webp output at. For lossy output higher values look better "
+            "but make larger files. For lossless output this is the compression effort instead, where higher values make "
+            "smaller files but take longer. Defaults to 80."
+        ),
+    )
+    render_parser.add_argument(
+        "--webp-method",
+        type=int,
+        default=0,
+        help=(
+            "The encoding method, from 0 to 6, to use for animated .webp output. Lower values are faster, higher values "
+            "produce smaller files but take much longer to encode. Defaults to 0, the fastest."
         ),
     )
+    render_parser.add_argument(
+        "--webp-lossless",
+        action="store_true",
+        help="Encode animated .webp output losslessly instead of using lossy compression.",
+    )
     render_parser.add_argument(
         "--background-color",
         type=str,
@@ -1220,6 +1740,9 @@ def main() -> int:
             write_mappings=args.write_mappings,
             write_raw=args.write_raw,
             write_binaries=args.write_binaries,
+            write_bytecode=args.write_bytecode,
+            disable_threads=args.disable_threads,
+            archive=args.archive,
             pretend=args.pretend,
             verbose=args.verbose,
         )
@@ -1242,6 +1765,11 @@ def main() -> int:
             args.output,
             disable_threads=args.disable_threads,
             enable_anti_aliasing=args.enable_anti_aliasing,
+            optimize=args.optimize,
+            max_buffered_frames=args.max_buffered_frames,
+            webp_quality=args.webp_quality,
+            webp_method=args.webp_method,
+            webp_lossless=args.webp_lossless,
             background_color=args.background_color,
             background_image=args.background_image,
             background_loop_start=args.background_loop_start,